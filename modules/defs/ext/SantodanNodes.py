@@ -1,8 +1,12 @@
 import re
 import os
+from functools import lru_cache
 from ..meta import MetaField
 from ..formatters import calc_model_hash, calc_vae_hash, calc_lora_hash
 
+# Regex to find: "path/lora.safetensors (0.85)"
+_LORA_RE = re.compile(r"([^,]+?)\s\(([-+]?\d*\.?\d+)\)")
+
 # --- Existing Helpers (Restored) ---
 
 try:
@@ -34,12 +38,13 @@ def get_vae_hash(node_id, obj, prompt, extra_data, outputs, input_data):
     return None
 
 def get_clip_names(node_id, obj, prompt, extra_data, outputs, input_data):
-    if input_data[0].get("load_mode", ["full_checkpoint"])[0] == "separate_components":
-        clip_names = []
-        for key in ["clip_model_1", "clip_model_2", "clip_model_3"]:
-            name = input_data[0].get(key, [None])[0]
-            if name and name != "None":
-                clip_names.append(name)
+    inputs = input_data[0]
+    if inputs.get("load_mode", ["full_checkpoint"])[0] == "separate_components":
+        clip_names = [
+            name
+            for name in (inputs.get(key, [None])[0] for key in ("clip_model_1", "clip_model_2", "clip_model_3"))
+            if name and name != "None"
+        ]
         return clip_names if clip_names else None
     return None
 
@@ -59,11 +64,18 @@ def get_unet_dtype(node_id, obj, prompt, extra_data, outputs, input_data):
         return input_data[0].get("weight_dtype", [None])[0]
     return None
     
-def get_metadata_field(field_name, node_id, obj, prompt, extra_data, outputs, input_data):
-    metadata_dict = input_data[0].get("metadata", [None])[0]
-    if metadata_dict and isinstance(metadata_dict, dict):
-        return metadata_dict.get(field_name)
-    return None
+class _MetaFieldSelector:
+    """Selector returning one field of the ModelAssemblerMetadata 'metadata' dict."""
+    __slots__ = ("field",)
+
+    def __init__(self, field):
+        self.field = field
+
+    def __call__(self, node_id, obj, prompt, extra_data, outputs, input_data):
+        metadata_dict = input_data[0].get("metadata", [None])[0]
+        if metadata_dict and isinstance(metadata_dict, dict):
+            return metadata_dict.get(self.field)
+        return None
 
 # --- Hub Node Logic ---
 
@@ -71,37 +83,45 @@ def parse_lora_hub_data(input_data):
     """
     Parses all 'loras_X' inputs from the Hub node.
     Since these are inputs, input_data[0] contains the resolved strings.
+    Returns a tuple of (name, strength) pairs.
     """
-    all_loras = []
     inputs = input_data[0]
-    
+    lora_strs = []
+
     # Check all possible lora string inputs on the hub
     for i in range(1, 5):
         lora_str = inputs.get(f"loras_{i}", "")
         if isinstance(lora_str, list): lora_str = lora_str[0]
-        if lora_str and isinstance(lora_str, str):
-            # Regex to find: "path/lora.safetensors (0.85)"
-            matches = re.findall(r"([^,]+?)\s\(([-+]?\d*\.?\d+)\)", lora_str)
+        lora_strs.append(lora_str if isinstance(lora_str, str) else "")
+    return _parse_lora_tuple(tuple(lora_strs))
+
+@lru_cache(maxsize=32)
+def _parse_lora_tuple(lora_strs):
+    # Cached so the name/strength/hash selectors share a single regex pass
+    all_loras = []
+    for lora_str in lora_strs:
+        if lora_str:
+            matches = _LORA_RE.findall(lora_str)
             for m in matches:
-                all_loras.append({"name": m[0].strip(), "strength": float(m[1])})
-    return all_loras
+                all_loras.append((m[0].strip(), float(m[1])))
+    return tuple(all_loras)
 
 def get_hub_lora_names(node_id, obj, prompt, extra_data, outputs, input_data):
     data = parse_lora_hub_data(input_data)
-    return [d["name"] for d in data] if data else None
+    return [name for name, _ in data] if data else None
 
 def get_hub_lora_strengths(node_id, obj, prompt, extra_data, outputs, input_data):
     data = parse_lora_hub_data(input_data)
-    return [d["strength"] for d in data] if data else None
+    return [strength for _, strength in data] if data else None
 
 def get_hub_lora_hashes(node_id, obj, prompt, extra_data, outputs, input_data):
     data = parse_lora_hub_data(input_data)
     if not data: return None
     hashes = []
-    for d in data:
+    for name, _ in data:
         try:
             # Full path is preserved now, so calc_lora_hash will work
-            h = calc_lora_hash(d["name"], input_data)
+            h = calc_lora_hash(name, input_data)
             hashes.append(h if h else None)
         except:
             hashes.append(None)
@@ -121,14 +141,14 @@ CAPTURE_FIELD_LIST = {
         "UNet Weight Type": {"selector": get_unet_dtype},
     },
     "ModelAssemblerMetadata": {
-        MetaField.MODEL_NAME:     {"selector": lambda *args: get_metadata_field("model_name", *args)},
-        MetaField.MODEL_HASH:     {"selector": lambda *args: get_metadata_field("model_hash", *args)},
-        MetaField.VAE_NAME:       {"selector": lambda *args: get_metadata_field("vae_name", *args)},
-        MetaField.VAE_HASH:       {"selector": lambda *args: get_metadata_field("vae_hash", *args)},
-        "Clip Model Name(s)": {"selector": lambda *args: get_metadata_field("clip_names", *args)},
-        "Clip Model Hash(es)": {"selector": lambda *args: get_metadata_field("clip_hashes", *args)},
-        "Clip Type":          {"selector": lambda *args: get_metadata_field("clip_type", *args)},
-        "UNet Weight Type":   {"selector": lambda *args: get_metadata_field("unet_dtype", *args)},
+        MetaField.MODEL_NAME:     {"selector": _MetaFieldSelector("model_name")},
+        MetaField.MODEL_HASH:     {"selector": _MetaFieldSelector("model_hash")},
+        MetaField.VAE_NAME:       {"selector": _MetaFieldSelector("vae_name")},
+        MetaField.VAE_HASH:       {"selector": _MetaFieldSelector("vae_hash")},
+        "Clip Model Name(s)": {"selector": _MetaFieldSelector("clip_names")},
+        "Clip Model Hash(es)": {"selector": _MetaFieldSelector("clip_hashes")},
+        "Clip Type":          {"selector": _MetaFieldSelector("clip_type")},
+        "UNet Weight Type":   {"selector": _MetaFieldSelector("unet_dtype")},
     },
     "LoraMetadataHub": {
         MetaField.LORA_MODEL_NAME: {"selector": get_hub_lora_names},
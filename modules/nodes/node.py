@@ -1,10 +1,11 @@
+import io
 import json
 import os
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
 
-import numpy as np
 import piexif
 import piexif.helper
 from PIL import Image
@@ -16,6 +17,7 @@ import folder_paths
 from .. import hook
 from ..capture import Capture
 from ..trace import Trace
+from ..utils.image import to_uint8
 from ..utils.log import print_warning
 
 
@@ -54,7 +56,7 @@ class SaveImageWithMetaData:
         self.output_dir = folder_paths.get_output_directory()
         self.type = "output"
         self.prefix_append = ""
-        self.compress_level = 4
+        self.compress_level = 1
 
     @classmethod
     def INPUT_TYPES(s):
@@ -101,6 +103,10 @@ class SaveImageWithMetaData:
                     "default": True,
                     "tooltip": "Select inputs from closest nodes first if true."
                 }),
+                "png_compression": ("INT", {
+                    "default": 1, "min": 0, "max": 9,
+                    "tooltip": "zlib compression level for PNG images (0-9). Higher values give slightly smaller files but save much slower. Other formats ignore this setting."
+                }),
             },
             "hidden": {
                 "prompt": "PROMPT",
@@ -116,6 +122,7 @@ class SaveImageWithMetaData:
     CATEGORY = "SaveImage"
 
     pattern_format = re.compile(r"(%[^%]+%)") # Pattern to match mask values in the filename
+    pattern_date = re.compile("yyyy|MM|dd|hh|mm|ss") # Pattern to match date tokens in %date:...%
 
     def parse_output_format(self, output_format: str):
         fmt = OutputFormat(output_format)
@@ -131,20 +138,30 @@ class SaveImageWithMetaData:
             QualityOption.LOW: 30
         }.get(quality, 100)
 
-    def find_next_available_filename(self, folder: str, name: str, ext: str):
+    def find_next_available_filename(self, folder: str, name: str, ext: str, existing=None):
         """
-        Finds the next available filename by checking existing files in the directory.
+        Finds the next available filename counter (highest existing counter + 1).
+        Uses the given directory listing if provided, otherwise scans the directory.
+        Names are compared with os.path.normcase to match the filesystem's case handling.
         """
-        existing = {f.stem for f in Path(folder).glob(f"{name}_*.{ext}")}
-        i = 1
-        while f"{name}_{i:05d}" in existing:
-            i += 1
-        return i
+        if existing is None:
+            with os.scandir(folder) as it:
+                existing = [entry.name for entry in it]
+
+        prefix, suffix = os.path.normcase(f"{name}_"), os.path.normcase(f".{ext}")
+        used = 0
+        for f in existing:
+            f = os.path.normcase(f)
+            if f.startswith(prefix) and f.endswith(suffix):
+                counter = f[len(prefix):-len(suffix)]
+                if counter.isdecimal():
+                    used = max(used, int(counter))
+        return used + 1
 
     @classmethod
     def parse_filename_placeholders(cls, filename: str) -> list[str]:
         """Extracts placeholder segments like %seed%, %pprompt:32%, etc."""
-        return re.findall(cls.pattern_format, filename) if "%" in filename else []
+        return cls.pattern_format.findall(filename) if "%" in filename else []
 
     def needs_pnginfo_in_filename(self, segments: list[str]) -> bool:
         for segment in segments:
@@ -156,11 +173,10 @@ class SaveImageWithMetaData:
     def save_images(self, images, filename_prefix="ComfyUI", subdirectory_name="", prompt=None,
                     extra_pnginfo=None, extra_metadata=None, output_format="png",
                     quality="max", metadata_scope="full",
-                    include_batch_num=True, prefer_nearest=True, pnginfo_dict=None):
+                    include_batch_num=True, prefer_nearest=True, pnginfo_dict=None, png_compression=None):
 
         extra_metadata = extra_metadata or {}
         base_format, save_workflow_json = self.parse_output_format(output_format)
-        pnginfo = PngInfo()
 
         # Parse filename
         filename_prefix = filename_prefix.strip()
@@ -169,8 +185,9 @@ class SaveImageWithMetaData:
         if metadata_scope in [MetadataScope.FULL, MetadataScope.PARAMETERS_ONLY] or self.needs_pnginfo_in_filename(segments):
             pnginfo_dict = pnginfo_dict or self.gen_pnginfo(prompt, prefer_nearest)
 
-        filename_prefix = self.format_filename(filename_prefix, pnginfo_dict or {}, segments) + self.prefix_append
-        subdirectory_name = self.format_filename(subdirectory_name, pnginfo_dict or {})
+        date_table = self.get_date_table()
+        filename_prefix = self.format_filename(filename_prefix, pnginfo_dict or {}, date_table) + self.prefix_append
+        subdirectory_name = self.format_filename(subdirectory_name, pnginfo_dict or {}, date_table)
 
 
         image_shape = images[0].shape
@@ -181,7 +198,7 @@ class SaveImageWithMetaData:
         # Handle subdirectory naming and creation
         subdirectory_name = subdirectory_name.strip()
         if subdirectory_name:
-            subdirectory_name = self.format_filename(subdirectory_name, pnginfo_dict)
+            subdirectory_name = self.format_filename(subdirectory_name, pnginfo_dict, date_table)
             full_output_folder = os.path.join(self.output_dir, subdirectory_name)
             filename = filename_prefix
 
@@ -189,53 +206,99 @@ class SaveImageWithMetaData:
 
         results = list()
         images_length = len(images)
-        last_image_filename = None
+        quality_value = self.get_quality_value(quality)
+        compress_level = self.compress_level if png_compression is None else png_compression
+        # List the folder once instead of stat-ing every path; files claimed by this batch are added as they are queued.
+        # Names are normcased so case-insensitive filesystems (e.g. Windows) see the same collisions as os.path.exists
+        existing_files = {os.path.normcase(f) for f in os.listdir(full_output_folder)}
+        next_count = None
+        max_workers = max(1, min(8, images_length))
+        # Encoded images waiting to be written, in batch order
+        pending = deque()
+
+        # Parameters are identical for every image in the batch, only batch keys are appended per image.
+        # They are only needed for the pnginfo "parameters" text or the jpg/webp EXIF payload.
+        parameters_str = None
+        if metadata_scope in [MetadataScope.FULL, MetadataScope.PARAMETERS_ONLY] or base_format in ["jpg", "webp"]:
+            parameters_str = Capture.gen_parameters_str(pnginfo_dict)
+
+        # The prompt and workflow JSON can be large, so serialize them once for the whole batch
+        prompt_json = json.dumps(prompt) if prompt is not None else None
+        extra_pnginfo_json = {k: json.dumps(v) for k, v in extra_pnginfo.items()} if extra_pnginfo is not None else None
+        extra_metadata_text = [(k, v if isinstance(v, str) else json.dumps(v)) for k, v in extra_metadata.items() if k]
+
+        exif_bytes = None
+        if base_format in ["jpg", "webp"]:
+            exif_bytes = piexif.dump({
+                "Exif": {
+                    piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(parameters_str, encoding="unicode")
+                }
+            })
+
+        # Convert the whole batch at once: one device sync and one uint8 transfer instead of one per image
+        images_u8 = to_uint8(images)
+
+        def next_free_file():
+            # The listing is only scanned on the first collision, later ones continue from that counter
+            nonlocal next_count
+            if next_count is None:
+                next_count = self.find_next_available_filename(full_output_folder, filename, base_format, existing_files)
+            while os.path.normcase(f"{filename}_{next_count:05d}.{base_format}") in existing_files:
+                next_count += 1
+            file = f"{filename}_{next_count:05d}.{base_format}"
+            next_count += 1
+            existing_files.add(os.path.normcase(file))
+            return file, os.path.join(full_output_folder, file)
+
+        def write_oldest():
+            # Write the oldest pending image, re-raising its encoding failure, if any
+            path, file, future = pending.popleft()
+            data = future.result()
+            # Exclusive create, so a file missed by the listing snapshot is never overwritten
+            while True:
+                try:
+                    with open(path, "xb") as f:
+                        f.write(data)
+                    break
+                except FileExistsError:
+                    file, path = next_free_file()
+            results.append({"filename": file, "subfolder": full_output_folder, "type": self.type})
 
-        # Process each image
-        for batch_number, image in enumerate(images):
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+        # Encoding releases the GIL, so images are encoded concurrently; the number of
+        # pending images is capped so memory stays bounded for long batches
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Process each image
+            for batch_number in range(images_length):
+                img = Image.fromarray(images_u8[batch_number])
 
-            # Prepare metadata
-            metadata = self.prepare_pnginfo(pnginfo, pnginfo_dict, batch_number, images_length, prompt, extra_pnginfo, metadata_scope)
-            for key, value in extra_metadata.items():
-                metadata.add_text(key, value)
+                # Prepare metadata
+                metadata = self.prepare_pnginfo(PngInfo(), pnginfo_dict, batch_number, images_length, prompt_json, extra_pnginfo_json, metadata_scope, parameters_str)
+                for key, value in extra_metadata_text:
+                    metadata.add_text(key, value)
 
-            # Handle filename collision and batch number inclusion
-            file = f"{filename}_{batch_number:05d}.{base_format}" if include_batch_num else f"{filename}.{base_format}"
-            path = os.path.join(full_output_folder, file)
-
-            # Check for filename collision (using next available name)
-            if os.path.exists(path):
-                count = self.find_next_available_filename(full_output_folder, filename, base_format)
-                file = f"{filename}_{count:05d}.{base_format}"
+                # Handle filename collision and batch number inclusion
+                file = f"{filename}_{batch_number:05d}.{base_format}" if include_batch_num else f"{filename}.{base_format}"
                 path = os.path.join(full_output_folder, file)
 
-            last_image_filename = file
-            quality_value = self.get_quality_value(quality)
-
-            # Save image based on format
-            if base_format == "webp":
-                img.save(path, "WEBP", lossless=(quality_value == 100), quality=quality_value)
-            elif base_format == "png":
-                img.save(path, pnginfo=metadata, compress_level=self.compress_level)
-            else:
-                img.save(path, optimize=True, quality=quality_value)
-
-            # Insert EXIF for jpg/webp formats
-            if base_format in ["jpg", "webp"]:
-                exif_bytes = piexif.dump({
-                    "Exif": {
-                        piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(Capture.gen_parameters_str(pnginfo_dict), encoding="unicode")
-                    }
-                })
-                piexif.insert(exif_bytes, path)
+                # Check for filename collision (using next available name)
+                if os.path.normcase(file) in existing_files:
+                    file, path = next_free_file()
+                else:
+                    existing_files.add(os.path.normcase(file))
 
-            results.append({"filename": file, "subfolder": full_output_folder, "type": self.type})
+                pending.append((path, file, executor.submit(
+                    self.encode_image, img, base_format, metadata, quality_value, compress_level, exif_bytes
+                )))
+
+                if len(pending) >= 2 * max_workers:
+                    write_oldest()
+
+            while pending:
+                write_oldest()
 
         # Save workflow metadata for the batch
-        if save_workflow_json and images_length > 0 and last_image_filename:
-            json_filename = last_image_filename.replace(base_format, "json")
+        if save_workflow_json and results:
+            json_filename = results[-1]["filename"].replace(base_format, "json")
             batch_json_file = os.path.join(full_output_folder, json_filename)
 
             with open(batch_json_file, "w", encoding="utf-8") as f:
@@ -244,33 +307,53 @@ class SaveImageWithMetaData:
         # --- CHANGE 2: Return the original images along with the UI data ---
         return {"ui": {"images": results}, "result": (images,)}
 
-    def prepare_pnginfo(self, metadata, pnginfo_dict, batch_number, total_images, prompt, extra_pnginfo, metadata_scope):
+    def encode_image(self, img, base_format, metadata, quality_value, compress_level, exif_bytes=None):
+        """
+        Encodes a single image in memory, inserting precomputed EXIF bytes for jpg/webp formats.
+        Returns the encoded file contents.
+        """
+        buf = io.BytesIO()
+
+        # Save image based on format
+        if base_format == "webp":
+            img.save(buf, "WEBP", lossless=(quality_value == 100), quality=quality_value)
+        elif base_format == "png":
+            img.save(buf, "PNG", pnginfo=metadata, compress_level=compress_level)
+        else:
+            img.save(buf, "JPEG", optimize=True, quality=quality_value)
+
+        # Insert EXIF for jpg/webp formats
+        if exif_bytes is not None:
+            out = io.BytesIO()
+            piexif.insert(exif_bytes, buf.getvalue(), out)
+            return out.getvalue()
+
+        return buf.getvalue()
+
+    def prepare_pnginfo(self, metadata, pnginfo_dict, batch_number, total_images, prompt_json, extra_pnginfo_json, metadata_scope, parameters_base=None):
         """
         Return final PNG metadata with batch information, parameters, and optional prompt details.
+        `prompt_json`, `extra_pnginfo_json` and `parameters_base` are pre-serialized once for the whole batch.
         """
         if metadata_scope == MetadataScope.NONE:
             return None
 
         if pnginfo_dict:
-            pnginfo_copy = pnginfo_dict.copy()
-
-            if total_images > 1:
-                pnginfo_copy["Batch index"] = batch_number
-                pnginfo_copy["Batch size"] = total_images
-
             if metadata_scope in [MetadataScope.FULL, MetadataScope.PARAMETERS_ONLY]:
-                parameters = Capture.gen_parameters_str(pnginfo_copy)
+                parameters = parameters_base if parameters_base is not None else Capture.gen_parameters_str(pnginfo_dict)
                 if parameters and "Steps" in parameters:
+                    if total_images > 1:
+                        parameters += f", Batch index: {batch_number}, Batch size: {total_images}"
                     metadata.add_text("parameters", parameters)
                     if metadata_scope == MetadataScope.PARAMETERS_ONLY:
                         return metadata
 
-        if prompt is not None and metadata_scope != MetadataScope.WORKFLOW_ONLY:
-            metadata.add_text("prompt", json.dumps(prompt))
+        if prompt_json is not None and metadata_scope != MetadataScope.WORKFLOW_ONLY:
+            metadata.add_text("prompt", prompt_json)
 
-        if extra_pnginfo is not None:
-            for x in extra_pnginfo:
-                metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+        if extra_pnginfo_json is not None:
+            for key, value in extra_pnginfo_json.items():
+                metadata.add_text(key, value)
 
         return metadata
 
@@ -290,16 +373,12 @@ class SaveImageWithMetaData:
         return Capture.gen_pnginfo_dict(inputs_before_sampler_node, inputs_before_this_node, prompt)
 
     @classmethod
-    def format_filename(cls, filename, pnginfo_dict, segments=None):
+    def get_date_table(cls):
         """
-        Replaces placeholders in the filename with actual values like date, seed, prompt, etc.
+        Returns the current date/time values for the date tokens used by %date:...%.
         """
-        if "%" not in filename:
-            return filename
-
-        segments = segments or re.findall(cls.pattern_format, filename)
         now = datetime.now()
-        date_table = {
+        return {
             "yyyy": f"{now.year}",
             "MM": f"{now.month:02d}",
             "dd": f"{now.day:02d}",
@@ -308,7 +387,18 @@ class SaveImageWithMetaData:
             "ss": f"{now.second:02d}",
         }
 
-        for segment in segments:
+    @classmethod
+    def format_filename(cls, filename, pnginfo_dict, date_table=None):
+        """
+        Replaces placeholders in the filename with actual values like date, seed, prompt, etc.
+        """
+        if "%" not in filename:
+            return filename
+
+        date_table = date_table or cls.get_date_table()
+
+        def replace(m):
+            segment = m.group(0)
             parts = segment.strip("%").split(":")
             key = parts[0]
 
@@ -316,14 +406,13 @@ class SaveImageWithMetaData:
                 seed = pnginfo_dict.get("Seed")
                 if seed is None:
                     print_warning("Seed not found in pnginfo_dict!")
-                filename = filename.replace(segment, str(seed or ""))
+                return str(seed or "")
 
             elif key in {"width", "height"}:
                 size = pnginfo_dict.get("Size", "x").split("x")
                 if "Size" not in pnginfo_dict:
                     print_warning("Size not found in pnginfo_dict!")
-                value = size[0] if key == "width" else size[1]
-                filename = filename.replace(segment, value)
+                return size[0] if key == "width" else size[1]
 
             elif key in {"pprompt", "nprompt"}:
                 prompt_key = "Positive prompt" if key == "pprompt" else "Negative prompt"
@@ -332,7 +421,7 @@ class SaveImageWithMetaData:
                     print_warning(f"{prompt_key} not found in pnginfo_dict!")
                 prompt = prompt.replace("\n", " ")
                 length = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-                filename = filename.replace(segment, prompt[:length].strip() if length else prompt.strip())
+                return prompt[:length].strip() if length else prompt.strip()
 
             elif key == "model":
                 model = pnginfo_dict.get("Model", "")
@@ -340,15 +429,15 @@ class SaveImageWithMetaData:
                     print_warning("Model not found in pnginfo_dict!")
                 model = os.path.splitext(os.path.basename(model))[0]
                 length = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-                filename = filename.replace(segment, model[:length] if length else model)
+                return model[:length] if length else model
 
             elif key == "date":
                 date_format = parts[1] if len(parts) > 1 else "yyyyMMddhhmmss"
-                for k, v in date_table.items():
-                    date_format = date_format.replace(k, v)
-                filename = filename.replace(segment, date_format)
+                return cls.pattern_date.sub(lambda d: date_table[d.group(0)], date_format)
+
+            return segment
 
-        return filename
+        return cls.pattern_format.sub(replace, filename)
 
 
 class CreateExtraMetaData:
@@ -374,9 +463,15 @@ class CreateExtraMetaData:
         if extra_metadata is None:
             extra_metadata = {}
 
-        for i in range(1, 5):
-            key = keys_values.get(f"key{i}", "").strip()
-            value = keys_values.get(f"value{i}", "").strip()
+        pairs = [(i, keys_values.get(f"key{i}"), keys_values.get(f"value{i}")) for i in range(1, 5)]
+
+        for i, key, value in pairs:
+            # Skip slots the user left empty
+            if not key and not value:
+                continue
+
+            key = (key or "").strip()
+            value = (value or "").strip()
 
             if key:
                 extra_metadata[key] = value
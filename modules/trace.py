@@ -3,6 +3,8 @@ from .defs.samplers import SAMPLERS
 from .utils.log import print_warning
 
 class Trace:
+    # Trace trees for the prompt object in _trace_prompt, keyed by start node id
+    _trace_prompt = None
     _trace_cache = {}
 
     @staticmethod
@@ -47,26 +49,20 @@ class Trace:
                     visited_edges.add(edge)
                     Q.append((next_id, distance + 1))
 
-    @classmethod
-    def _compute_trace_signature(cls, start_node_id, prompt):
-        structure = []
-        def collect_structure(nid, node, _):
-            structure.append((nid, node.get("class_type", "")))
-        cls._bfs_traverse(start_node_id, prompt, collect_structure)
-        structure.sort()
-        return hash(tuple(structure))
-
     @classmethod
     def trace(cls, start_node_id, prompt):
-        sig = cls._compute_trace_signature(start_node_id, prompt)
-        if sig in cls._trace_cache:
-            return cls._trace_cache[sig]
+        # Memoize on prompt identity so a cache hit costs no graph traversal
+        if prompt is not cls._trace_prompt:
+            cls._trace_prompt = prompt
+            cls._trace_cache = {}
+        if start_node_id in cls._trace_cache:
+            return cls._trace_cache[start_node_id]
 
         trace_tree = {}
         def build_trace(nid, node, dist):
             trace_tree[nid] = (dist, node.get("class_type", ""))
         cls._bfs_traverse(start_node_id, prompt, build_trace)
-        cls._trace_cache[sig] = trace_tree
+        cls._trace_cache[start_node_id] = trace_tree
         return trace_tree
 
     @classmethod
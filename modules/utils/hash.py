@@ -1,9 +1,9 @@
 import hashlib
 import threading
 import os
+import stat
 import json
 from collections import OrderedDict
-from functools import lru_cache
 
 from ..config import NODE_CACHE_DIR
 from .log import print_warning, print_error
@@ -12,6 +12,7 @@ CACHE_FILE = os.path.join(NODE_CACHE_DIR, "model_hash_cache.json")
 CACHE_SIZE_LIMIT = 100
 
 
+# key -> ((st_size, st_mtime_ns), hash); entries are only reused while the file identity matches
 cache_model_hash = OrderedDict()
 _disk_cache = {}
 _disk_cache_dirty = False
@@ -26,12 +27,13 @@ if os.path.exists(CACHE_FILE):
         print_error(f"Failed to load cache file {CACHE_FILE}: {e}")
         _disk_cache = {}
 
-@lru_cache(maxsize=100)  # Cache up to 100 file modification times
-def get_file_mod_time(path):
+def get_file_stat(path):
+    """Return os.stat() for a regular file, or None if the path is missing or not a file."""
     try:
-        return os.path.getmtime(path)
-    except Exception:
-        return 0
+        st = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
 
 def trim_disk_cache():
     global _disk_cache
@@ -56,23 +58,26 @@ def save_disk_cache():
 def calc_hash(filename, use_only_filename=True):
     global _disk_cache_dirty
 
-    if not filename or not os.path.isfile(filename):
+    file_stat = get_file_stat(filename) if filename else None
+    if file_stat is None:
         print_warning(f"calc_hash: File not found or invalid path: {filename}")
         return ""
 
     key = os.path.basename(filename) if use_only_filename else filename
-    current_mod_time = get_file_mod_time(filename)
+    identity = (file_stat.st_size, file_stat.st_mtime_ns)
+    current_mod_time = file_stat.st_mtime
 
     with _cache_lock:
-        # Check in-memory cache first
-        if key in cache_model_hash:
-            return cache_model_hash[key]
+        # Check in-memory cache first, ignoring entries for a since-modified file
+        cached = cache_model_hash.get(key)
+        if cached and cached[0] == identity:
+            return cached[1]
 
         # Check disk cache if not found in memory
         record = _disk_cache.get(key)
         if record and record.get("file_modification_date") == current_mod_time:
             # Update in-memory cache from disk cache
-            cache_model_hash[key] = record["file_hash"]
+            cache_model_hash[key] = (identity, record["file_hash"])
             # Maintain LRU order
             cache_model_hash.move_to_end(key)
             return record["file_hash"]
@@ -87,9 +92,9 @@ def calc_hash(filename, use_only_filename=True):
 
         with _cache_lock:
             # Update in-memory cache with size limit
-            if len(cache_model_hash) >= CACHE_SIZE_LIMIT:
+            if key not in cache_model_hash and len(cache_model_hash) >= CACHE_SIZE_LIMIT:
                 cache_model_hash.popitem(last=False)  # Remove oldest item
-            cache_model_hash[key] = model_hash
+            cache_model_hash[key] = (identity, model_hash)
 
             # Update disk cache only if necessary
             if key not in _disk_cache or _disk_cache[key].get("file_modification_date") != current_mod_time:
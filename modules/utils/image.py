@@ -0,0 +1,32 @@
+import numpy as np
+import torch
+
+# numba is optional, without it images are converted with torch ops only
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _to_u8_kernel(x):
+        out = np.empty(x.shape, np.uint8)
+        for i in prange(x.shape[0]):
+            v = x[i] * 255.0
+            # Only cast values known to be in range; NaN fails both checks and maps to 0
+            out[i] = np.uint8(v) if v >= 0 and v <= 255 else (255 if v > 255 else 0)
+        return out
+
+
+def to_uint8(image):
+    """
+    Convert a float image (or image batch) tensor in [0, 1] to a uint8 numpy array.
+
+    CPU float32 tensors go through a single-pass numba kernel when numba is installed,
+    everything else is scaled and clamped on its own device before transferring uint8 bytes.
+    """
+    if njit is not None and image.device.type == "cpu" and image.dtype == torch.float32:
+        x = image.contiguous().numpy()
+        return _to_u8_kernel(x.reshape(-1)).reshape(x.shape)
+
+    return image.mul(255).clamp_(0, 255).to(torch.uint8, memory_format=torch.contiguous_format).cpu().numpy()